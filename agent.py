@@ -1,21 +1,25 @@
 from torchvision import transforms
 from collections import deque
-from game import GeometryDash
-from model import GDAI, Trainer
-import torch_directml
+from model import GDAI, Trainer, get_device, n_step_returns
+from typing import TYPE_CHECKING
 import torch
 import random
 import time
 
+if TYPE_CHECKING: # game needs the Windows only input and capture libraries, replay.py runs without them
+    from game import GeometryDash
+
 MAX_MEMORY = 10000 # Increased memory for more diverse experiences
 BATCH_SIZE = 256 # Larger batch size for more stable gradients
 LR = 0.0005 # Slightly reduced learning rate for stability
+N_STEPS = 3 # Rewards summed into each long memory target before bootstrapping
 
 class Player():
     def __init__(self):
         self.n_games = 0
         self.gamma = 0.9
-        self.device = torch_directml.device()
+        self.explored = False # Whether the last action was a random exploration move
+        self.device = get_device()
 
         self.memory = deque(maxlen=MAX_MEMORY)
         self.model = GDAI()
@@ -30,26 +34,44 @@ class Player():
             transforms.ToTensor()
         ])
 
-    def get_state(self, game: GeometryDash):
+    def get_state(self, game: 'GeometryDash'):
         frame = game.get_current_frame()
         transformed_frame = self.transform(frame)
         return transformed_frame
     
     def remember(self, state, action, reward, next_state, done):
-        self.memory.append((state, action, reward, next_state, done))
+        # Last field marks the end of an episode, set by end_episode when the game stops without done
+        self.memory.append((state, action, reward, next_state, done, done))
 
-    def train_long_memory(self):
-        if len(self.memory) > BATCH_SIZE: mini_sample = random.sample(self.memory, BATCH_SIZE) 
-        else: mini_sample = self.memory
+    def end_episode(self):
+        """Marks the last transition as an episode boundary so n-step returns never cross it"""
+        if len(self.memory) > 0:
+            self.memory[-1] = self.memory[-1][:5] + (True,)
 
-        states, actions, rewards, next_states, dones = zip(*mini_sample)
-        self.trainer.train_step(states, actions, rewards, next_states, dones)
+    def train_long_memory(self):
+        # Memory is stored in order, so n-step returns are computed over the whole buffer
+        states, actions, rewards, next_states, dones, ends = zip(*self.memory)
+        returns, last, steps = n_step_returns(rewards, ends, self.gamma, N_STEPS)
+
+        if len(self.memory) > BATCH_SIZE: mini_sample = random.sample(range(len(self.memory)), BATCH_SIZE)
+        else: mini_sample = list(range(len(self.memory)))
+
+        bootstrap = last[mini_sample].tolist()
+        self.trainer.train_step(
+            [states[i] for i in mini_sample],
+            [actions[i] for i in mini_sample],
+            returns[mini_sample],
+            [next_states[i] for i in bootstrap],
+            [dones[i] for i in bootstrap],
+            steps[mini_sample]
+        )
 
     def train_short_memory(self, state, action, reward, next_state, done):
         self.trainer.train_step(state, action, reward, next_state, done)
 
     def get_action(self, state):
-        if random.randint(0, 200) < 200 - self.n_games: # Reduced range for faster decay
+        self.explored = random.randint(0, 200) < 200 - self.n_games # Reduced range for faster decay
+        if self.explored:
             final_move = torch.tensor([random.randint(0, 1)])
         else:
             state = state.to(self.device)
@@ -67,6 +89,7 @@ def main():
     record = 0
     
     player = Player()
+    from game import GeometryDash
     game = GeometryDash()
     
     time.sleep(1)
@@ -85,6 +108,7 @@ def main():
 
         if done:
             player.n_games += 1
+            player.end_episode()
             player.train_long_memory()
 
             if score > record:
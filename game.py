@@ -38,6 +38,8 @@ class GeometryDash:
         # Performance optimizations
         self.sct = mss.mss()  # Reuse MSS instance
 
+        self.recorder = None # Optional EpisodeRecorder, set by bot_loop
+
         win32gui.SetWindowText(self.hwnd, mp.current_process().name)
 
     def start_game(self):
@@ -56,12 +58,17 @@ class GeometryDash:
 
     def get_current_frame(self):
         """Optimized frame capture using cached MSS instance"""
+        start = time.perf_counter()
         try:
             screenshot = self.sct.grab(self.monitor)
-            return np.array(screenshot)  # Convert to numpy array directly
+            frame = np.array(screenshot)  # Convert to numpy array directly
         except Exception as e:
             print(f"[{mp.current_process().name}] Screenshot error: {e}")
-            return None
+            frame = None
+
+        if self.recorder is not None:
+            self.recorder.record_frame(frame, time.perf_counter() - start)
+        return frame
 
     def in_menu(self) -> bool:
         """Optimized menu detection with caching"""
@@ -1,6 +1,9 @@
 from pynput import keyboard as pynput_keyboard
-from game import GeometryDash, JUMP
+from game import GeometryDash
 from agent import Player, BATCH_SIZE
+from recorder import EpisodeRecorder
+from collections import deque
+from pathlib import Path
 import multiprocessing as mp
 import win32gui
 import time
@@ -8,6 +11,11 @@ import time
 # Settings
 WINDOW_NAME = "Geometry Dash"
 JUMP_INTERVAL = 0.5
+# Save frames, actions and timings of each game for replay.py. Compression runs on a writer thread,
+# queuing costs the bot loop ~0.1 ms per step, the thread needs ~15-20 ms of CPU per 1280x720 frame
+RECORD_EPISODES = True
+RECORDING_FOLDER = Path('recordings')
+MAX_RECORDINGS = 20 # Per bot, oldest episodes are deleted first
 
 def find_all_windows(title):
     """Find all windows with the specified title - optimized with early return"""
@@ -37,37 +45,60 @@ def bot_loop(hwnd, player: Player, stop_event, input_lock, shared_memory_list):
 
     record = 0
     score = 0
+    recordings = deque()
+    session = time.strftime('%Y%m%d_%H%M%S')
     while not stop_event.is_set():
         game.reset_inputs()
         game.reset_timer()
         game.start_game()
+
+        path = None
+        if RECORD_EPISODES:
+            path = RECORDING_FOLDER / f"{mp.current_process().name}_{session}_{player.n_games}.gdrec"
+        recorder = EpisodeRecorder(path)
+        game.recorder = recorder
         
         while game.in_menu() is False:
             if not validate_window(hwnd):
                 print(f"Window {hwnd} is no longer valid")
                 break
 
-            state_old = player.get_state(game)
-            final_move = player.get_action(state_old)
+            with recorder.stage('preprocess'):
+                state_old = player.get_state(game)
+            with recorder.stage('inference'):
+                final_move = player.get_action(state_old)
 
             # Use input lock to prevent race conditions
             with input_lock:
-                game.reset_inputs()
-                if not game.set_focus(): break
-                reward, done, score = game.read_input(final_move)
-
-            state_new = player.get_state(game)
+                with recorder.stage('input'):
+                    game.reset_inputs()
+                    if not game.set_focus(): break
+                    reward, done, score = game.read_input(final_move)
+                    recorder.record_input(final_move, reward, done, score, explored=player.explored)
+
+            with recorder.stage('preprocess'):
+                state_new = player.get_state(game)
             
             # train short memory
-            player.train_short_memory(state_old, final_move, reward, state_new, done)
-            player.remember(state_old, final_move, reward, state_new, done)
+            with recorder.stage('train'):
+                player.train_short_memory(state_old, final_move, reward, state_new, done)
+                player.remember(state_old, final_move, reward, state_new, done)
+            recorder.end_step()
+
+        recorder.close()
+        game.recorder = None
+        if path is not None and path.exists(): # Games that never left the menu leave no file
+            recordings.append(path)
+        if len(recordings) > MAX_RECORDINGS:
+            recordings.popleft().unlink(missing_ok=True)
 
         player.n_games += 1
+        player.end_episode() # The loop can also stop without a done transition
         game.reset_inputs()
         
         if len(player.memory) > 0:
-            for memory in player.memory:
-                shared_memory_list.append(memory)
+            # Extend in one call so each episode stays contiguous for n-step returns
+            shared_memory_list.extend(player.memory)
             player.memory.clear()
         
         # Occassionally Training on Shared Memory
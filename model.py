@@ -1,9 +1,19 @@
 import torch.optim as optim
 import torch.nn as nn
-import torch_directml
 import torch
 from pathlib import Path
 
+try:
+    import torch_directml
+except ImportError: # Windows/WSL only, Linux falls back to CUDA or CPU
+    torch_directml = None
+
+def get_device():
+    """DirectML when installed, otherwise CUDA or CPU"""
+    if torch_directml is not None: return torch_directml.device()
+    if torch.cuda.is_available(): return torch.device('cuda')
+    return torch.device('cpu')
+
 class GDAI(nn.Module):
     def __init__(self):
         super().__init__()
@@ -49,7 +59,8 @@ class GDAI(nn.Module):
         model_folder_path = Path('model')
         model_folder_path.mkdir(parents=True, exist_ok=True)  # Ensure the directory exists
         file_name = model_folder_path / file_name
-        torch.save(self.state_dict(), file_name)
+        # CPU copies so checkpoints also load where DirectML is not installed
+        torch.save({name: tensor.cpu() for name, tensor in self.state_dict().items()}, file_name)
 
     def load(self, file_name='model.pth'):
         model_folder_path = Path('model')
@@ -57,46 +68,89 @@ class GDAI(nn.Module):
             print("No Model Folder")
             return
         file_name = model_folder_path / file_name
-        self.load_state_dict(torch.load(f=file_name))
+        # Older checkpoints hold DirectML tensors rebuilt through numpy, which weights_only cannot load
+        self.load_state_dict(torch.load(f=file_name, map_location='cpu', weights_only=False))
+
+def n_step_returns(rewards, ends, gamma, n_steps):
+    """Vectorized n-step returns over a replay buffer, windows stop at episode ends"""
+    rewards = torch.as_tensor(rewards, dtype=torch.float)
+    ends = torch.as_tensor(ends, dtype=torch.bool)
+    length = rewards.shape[0]
+
+    # Window of the next n_steps transitions for every start index, shape (length, n_steps)
+    offsets = torch.arange(n_steps)
+    window = torch.arange(length).unsqueeze(1) + offsets
+    in_buffer = window < length
+    window = window.clamp(max=length - 1)
+
+    # A step is only counted if no episode ended earlier in the window
+    window_ends = ends[window].float()
+    ended_before = (torch.cumsum(window_ends, dim=1) - window_ends) > 0
+    valid = in_buffer & ~ended_before
+
+    returns = (rewards[window] * (gamma ** offsets) * valid).sum(dim=1)
+    steps = valid.sum(dim=1)
+    # Index of the transition whose next_state is bootstrapped from
+    last = window.gather(1, (steps - 1).unsqueeze(1)).squeeze(1)
+    return returns, last, steps
 
 class Trainer:
-    def __init__(self, model, lr, gamma):
+    def __init__(self, model, lr, gamma, fused=False):
         self.lr = lr
         self.gamma = gamma
-        self.device = torch_directml.device()
+        self.fused = fused # One forward pass over state and next_state, backward also spans both halves, see utils/benchmark_train_step.py
+        self.device = get_device()
         
         self.model = model
         self.optimizer = optim.Adam(model.parameters(), lr=self.lr)
         self.criterion = nn.MSELoss()
 
-    def train_step(self, state, action, reward, next_state, done):
-        # Convert to tensors and move to device
+    def train_step(self, state, action, reward, next_state, done, steps=1):
+        # Build batched CPU tensors, single transitions become a batch of one
         if not isinstance(state, torch.Tensor):
-            state = torch.stack(state, dim=0).float().to(self.device).requires_grad_(True)
-            action = torch.stack(action, dim=0).float().to(self.device)
-            reward = torch.tensor(reward, dtype=torch.float).to(self.device)
-            next_state = torch.stack(next_state, dim=0).float().to(self.device)
-            done = torch.tensor(done, dtype=torch.bool).to(self.device)
+            state = torch.stack(state, dim=0)
         else:
-            state = state.unsqueeze(0).float().to(self.device).requires_grad_(True)
-            action = action.unsqueeze(0).float().to(self.device)
-            reward = torch.tensor(reward, dtype=torch.float).unsqueeze(0).to(self.device)
-            next_state = next_state.unsqueeze(0).float().to(self.device)
-            done = torch.tensor(done, dtype=torch.bool).unsqueeze(0).to(self.device)
+            state = state.unsqueeze(0)
+            next_state = [next_state]
+            reward, done = [reward], [done]
+        next_state = torch.stack(next_state, dim=0)
+        reward = torch.as_tensor(reward, dtype=torch.float)
+        done = torch.as_tensor(done, dtype=torch.bool)
+
+        # Bootstrap discount gamma^steps, zero for terminal states
+        discount = self.gamma ** torch.as_tensor(steps, dtype=torch.float) * (~done)
+        discount = discount.expand(reward.shape)
+
+        # Pack everything the loss needs into one buffer so it reaches the device in a single transfer
+        # action is left out, the model outputs a single Q-value so it never indexes pred
+        batch_size = state.shape[0]
+        packed = torch.cat([
+            state.reshape(-1).float(),
+            next_state.reshape(-1).float(),
+            reward,
+            discount
+        ]).to(self.device)
+        frames, reward, discount = packed.split([state.numel() * 2, batch_size, batch_size])
+        frames = frames.view(batch_size * 2, *state.shape[1:])
 
         self.model.train()  # Ensure the model is in training mode
 
-        # Predicted Q values with current state
-        pred = self.model(state)
+        if self.fused:
+            # Single forward pass over state and next_state stacked together
+            Q_values = self.model(frames)
+            pred, next_Q_values = Q_values[:batch_size], Q_values[batch_size:].detach()
+        else:
+            pred = self.model(frames[:batch_size])
+            with torch.no_grad():
+                next_Q_values = self.model(frames[batch_size:])
 
         # Calculate target Q-values
         with torch.no_grad(): # Ensure target calculation does not track gradients
-            next_Q_values = self.model(next_state)
             max_next_Q = torch.max(next_Q_values, dim=1)[0]
             
-            # Bellman equation: Q_target = reward + gamma * max_Q(next_state)
+            # Bellman equation: Q_target = reward + gamma^n * max_Q(next_state)
             # For terminal states (done=True), Q_target is just the reward
-            target_Q_values = reward + self.gamma * max_next_Q * (~done)
+            target_Q_values = reward + discount * max_next_Q
             
             # Unsqueeze to match pred's shape (batch_size, 1)
             target_Q_values = target_Q_values.unsqueeze(1)
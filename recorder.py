@@ -0,0 +1,215 @@
+from collections import namedtuple
+from contextlib import contextmanager
+from pathlib import Path
+import multiprocessing as mp
+import numpy as np
+import threading
+import queue
+import math
+import struct
+import time
+import zlib
+
+# Episode file layout: MAGIC, stage names, then FRAME, STEP and TIMINGS records in the order they happened
+MAGIC = b'GDREC2'
+FRAME = b'F'
+STEP = b'S'
+TIMINGS = b'T'
+STAGES = ('capture', 'preprocess', 'inference', 'input', 'train', 'record')
+FRAME_HEADER = struct.Struct('<dBHHHI') # timestamp, keyframe, height, width, channels, payload size
+STEP_HEADER = struct.Struct('<didBBi') # timestamp, action, reward, done, explored, score
+INVALID_ACTION = -2**31 # Stored for NaN actions
+COMPRESSION_LEVEL = 1 # Fastest zlib level, the writer thread has to keep up with two frames per step
+QUEUE_SIZE = 32 # Records waiting for the writer thread, the bot loop blocks once it is full
+
+Frame = namedtuple('Frame', ['timestamp', 'image'])
+Step = namedtuple('Step', ['timestamp', 'action', 'reward', 'done', 'explored', 'score'])
+Timings = namedtuple('Timings', ['timestamp', 'durations'])
+
+def timings_header(stages):
+    # timestamp, one duration per stage
+    return struct.Struct('<d' + 'f' * len(stages))
+
+def action_code(action):
+    """Rounded model output as an int32, the model's Q-value is unbounded and may be NaN"""
+    try:
+        action = float(action)
+    except Exception:
+        return INVALID_ACTION
+    if math.isnan(action): return INVALID_ACTION
+    return int(min(max(action, INVALID_ACTION + 1), 2**31 - 1))
+
+class EpisodeRecorder:
+    def __init__(self, path=None):
+        """Streams frames, actions, rewards and stage timings to an episode file, path=None only times stages"""
+        self.path = path
+        self.start_time = time.monotonic()
+
+        self.timings_header = timings_header(STAGES)
+        self.timings = dict.fromkeys(STAGES, 0.0) # Current step
+        self.totals = dict.fromkeys(STAGES, 0.0) # Whole episode
+        self.steps = 0
+        self.nested = [] # Time spent in inner stages, excluded from the outer one
+
+        # Delta encoding, compression and writes run on a writer thread, the bot loop only queues records
+        self.queue = None
+        self.writer = None
+        self.failed = False
+        self.recorded_steps = 0 # Written by the writer thread, read after close
+        if path is not None:
+            self.queue = queue.Queue(maxsize=QUEUE_SIZE)
+            self.writer = threading.Thread(target=self.write_records, name=f"Recorder-{Path(path).name}", daemon=True)
+            self.writer.start()
+
+    def put(self, record):
+        if self.queue is None or self.failed: return
+        self.queue.put(record)
+
+    def write_records(self):
+        """Writer thread, the file is opened on the first record so games that never start leave no file"""
+        file = None
+        previous = None # Last written frame, base for the next delta
+        while True:
+            record = self.queue.get()
+            if record is None: break
+            if self.failed: continue # Keep draining so the bot loop never blocks on a dead writer
+
+            try:
+                if file is None:
+                    Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+                    file = open(self.path, 'wb')
+                    names = ','.join(STAGES).encode()
+                    file.write(MAGIC + struct.pack('<H', len(names)) + names)
+
+                kind, *fields = record
+                if kind == FRAME:
+                    timestamp, frame = fields
+                    if frame is None: # Failed screenshot, replayed as None
+                        previous = None
+                        file.write(FRAME + FRAME_HEADER.pack(timestamp, 1, 0, 0, 0, 0))
+                        continue
+
+                    frame = np.ascontiguousarray(frame, dtype=np.uint8)
+                    keyframe = previous is None or previous.shape != frame.shape
+                    data = frame if keyframe else np.bitwise_xor(frame, previous)
+                    payload = zlib.compress(data.tobytes(), COMPRESSION_LEVEL)
+
+                    height, width, channels = frame.shape
+                    file.write(FRAME + FRAME_HEADER.pack(timestamp, keyframe, height, width, channels, len(payload)))
+                    file.write(payload)
+                    previous = frame
+
+                elif kind == STEP:
+                    file.write(STEP + STEP_HEADER.pack(*fields))
+                    self.recorded_steps += 1
+
+                else:
+                    file.write(TIMINGS + self.timings_header.pack(*fields))
+
+            except Exception as e:
+                # Recording stops for this game, the bot loop keeps running
+                print(f"[{mp.current_process().name}] Recording error, stopped recording {self.path}: {e}")
+                self.failed = True
+
+        if file is None: return
+        try:
+            file.close()
+            if self.recorded_steps == 0: Path(self.path).unlink(missing_ok=True)
+        except Exception as e:
+            print(f"[{mp.current_process().name}] Recording error while closing {self.path}: {e}")
+
+    def charge(self, stage, duration):
+        """Adds time spent in a stage to the current step"""
+        self.timings[stage] += duration
+        if self.nested: self.nested[-1] += duration
+
+    @contextmanager
+    def stage(self, name):
+        """Times a block of the bot loop, stages may be nested"""
+        start = time.perf_counter()
+        self.nested.append(0.0)
+        try:
+            yield
+        finally:
+            inner = self.nested.pop()
+            elapsed = time.perf_counter() - start
+            self.timings[name] += elapsed - inner
+            if self.nested: self.nested[-1] += elapsed
+
+    def record_frame(self, frame, capture_time=0.0):
+        """Queues a captured frame, it must not be modified afterwards as the writer reads it later"""
+        self.charge('capture', capture_time)
+        start = time.perf_counter()
+        self.put((FRAME, time.monotonic() - self.start_time, frame))
+        self.charge('record', time.perf_counter() - start)
+
+    def record_input(self, action, reward, done, score, explored=False):
+        """Queues the chosen action, whether it was a random exploration move, and its outcome"""
+        start = time.perf_counter()
+        self.put((STEP, time.monotonic() - self.start_time, action_code(action), reward, done, explored, score))
+        self.charge('record', time.perf_counter() - start)
+
+    def end_step(self):
+        """Queues the stage timings of the finished step and starts the next one"""
+        self.put((TIMINGS, time.monotonic() - self.start_time, *self.timings.values()))
+
+        for stage, duration in self.timings.items():
+            self.totals[stage] += duration
+            self.timings[stage] = 0.0
+        self.steps += 1
+
+    def close(self):
+        """Waits for the writer thread to finish the episode file"""
+        if self.writer is None: return
+        self.queue.put(None)
+        self.writer.join()
+        self.writer = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except:
+            pass
+
+def read_episode(path):
+    """Yields the Frame, Step and Timings records of an episode file in recorded order"""
+    with open(path, 'rb') as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not an episode file")
+        (size,) = struct.unpack('<H', file.read(2))
+        stages = file.read(size).decode().split(',')
+        header = timings_header(stages)
+
+        previous = None
+        while True:
+            kind = file.read(1)
+            if kind == FRAME:
+                data = file.read(FRAME_HEADER.size)
+                if len(data) < FRAME_HEADER.size: return # Truncated by a crash
+                timestamp, keyframe, height, width, channels, size = FRAME_HEADER.unpack(data)
+                payload = file.read(size)
+                if len(payload) < size: return
+
+                if height == 0:
+                    previous = None
+                    yield Frame(timestamp, None)
+                    continue
+
+                image = np.frombuffer(zlib.decompress(payload), dtype=np.uint8).reshape(height, width, channels)
+                previous = image if keyframe else np.bitwise_xor(image, previous)
+                yield Frame(timestamp, previous.copy()) # Copy so callers cannot corrupt the delta base
+
+            elif kind == STEP:
+                data = file.read(STEP_HEADER.size)
+                if len(data) < STEP_HEADER.size: return
+                timestamp, action, reward, done, explored, score = STEP_HEADER.unpack(data)
+                yield Step(timestamp, action, reward, bool(done), bool(explored), score)
+
+            elif kind == TIMINGS:
+                data = file.read(header.size)
+                if len(data) < header.size: return
+                timestamp, *durations = header.unpack(data)
+                yield Timings(timestamp, dict(zip(stages, durations)))
+
+            else: # End of file
+                return
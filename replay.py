@@ -0,0 +1,166 @@
+from recorder import EpisodeRecorder, Frame, Timings, STAGES, action_code, read_episode
+from pathlib import Path
+import argparse
+import time
+
+class ReplayGame:
+    def __init__(self, paths, speed=0.0):
+        """Plays recorded episodes back through the GeometryDash interface"""
+        self.paths = [paths] if isinstance(paths, (str, Path)) else list(paths)
+        self.speed = speed # 1.0 is real time, 0 replays as fast as possible
+        self.recorder = None # Optional EpisodeRecorder, same hook as GeometryDash
+
+        self.episode = -1
+        self.records = iter(())
+        self.pending = None # Next record, peeked but not consumed yet
+        self.frame = None
+        self.score = 0
+        self.done = True
+        self.finished = False # Every episode has been played
+
+        # Regression stats
+        self.steps = 0
+        self.model_steps = 0 # Recorded actions chosen by the model, random exploration moves are not compared
+        self.mismatches = 0 # Model chosen actions that differ from the recorded ones
+        self.recorded_steps = 0 # Timings records read
+        self.recorded_totals = dict.fromkeys(STAGES, 0.0)
+
+        self.global_timer = 0
+        self.local_timer = 0
+
+    def next_record(self):
+        record, self.pending = self.pending, None
+        if record is None: record = next(self.records, None)
+        while isinstance(record, Timings): # Not part of the game, only kept for comparison
+            self.recorded_steps += 1
+            for stage, duration in record.durations.items():
+                if stage in self.recorded_totals: self.recorded_totals[stage] += duration
+            record = next(self.records, None)
+        return record
+
+    def start_game(self):
+        """Loads the next episode once the current one has ended"""
+        if not self.done: return
+        # Read what is left of the current episode, such as the timings of its final step
+        while self.next_record() is not None: pass
+
+        while True:
+            self.episode += 1
+            if self.episode >= len(self.paths):
+                self.finished = True
+                return
+
+            self.records = read_episode(self.paths[self.episode])
+            self.pending = None
+            record = self.next_record()
+            self.pending = record
+            if isinstance(record, Frame): break
+            # Recordings without a first frame are skipped, there is nothing to play
+
+        self.frame = None
+        self.score = 0
+        self.done = False
+
+        self.reset_inputs()
+        self.reset_timer()
+
+    def get_current_frame(self):
+        """Returns the next recorded frame, or repeats the last one if the recording has a step first"""
+        start = time.perf_counter()
+        record = self.next_record()
+        if isinstance(record, Frame): self.frame = record.image
+        else: self.pending = record
+
+        if self.recorder is not None:
+            self.recorder.record_frame(self.frame, time.perf_counter() - start)
+        return self.frame
+
+    def in_menu(self) -> bool:
+        return self.done
+
+    def set_focus(self):
+        return True
+
+    def press_jump(self):
+        pass
+
+    def release_jump(self):
+        pass
+
+    def reset_inputs(self):
+        pass
+
+    def reset_timer(self):
+        current_time = time.monotonic()
+        self.global_timer = current_time
+        self.local_timer = current_time
+
+    def read_input(self, action):
+        """Returns the recorded outcome of the next step, frames the caller skipped are dropped"""
+        record = self.next_record()
+        while isinstance(record, Frame):
+            self.frame = record.image
+            record = self.next_record()
+
+        if record is None: # Recording ended without a death, e.g. the window was closed
+            self.done = True
+            return 0.0, True, self.score
+
+        if self.speed > 0:
+            delay = self.global_timer + record.timestamp / self.speed - time.monotonic()
+            if delay > 0: time.sleep(delay)
+
+        self.steps += 1
+        if not record.explored:
+            self.model_steps += 1
+            if action_code(action) != record.action: self.mismatches += 1
+
+        self.score = record.score
+        self.done = record.done
+        return record.reward, record.done, record.score
+
+def main():
+    from agent import Player
+
+    parser = argparse.ArgumentParser(description="Replay recorded episodes through the agent")
+    parser.add_argument('paths', nargs='+', help="Episode files to replay in order")
+    parser.add_argument('--speed', type=float, default=0.0, help="1.0 is real time, 0 is as fast as possible")
+    parser.add_argument('--model', default='model.pth', help="Model file in the model folder")
+    args = parser.parse_args()
+
+    player = Player()
+    player.model.load(file_name=args.model)
+    player.model = player.model.to(player.device)
+    player.n_games = 200 # Past the exploration range, every action comes from the model
+
+    game = ReplayGame(args.paths, speed=args.speed)
+    recorder = EpisodeRecorder()
+    game.recorder = recorder
+
+    start = time.perf_counter()
+    game.start_game()
+    while not game.finished:
+        while game.in_menu() is False:
+            with recorder.stage('preprocess'):
+                state_old = player.get_state(game)
+            with recorder.stage('inference'):
+                final_move = player.get_action(state_old)
+            with recorder.stage('input'):
+                game.read_input(final_move)
+            with recorder.stage('preprocess'):
+                player.get_state(game) # Consumes the frame bot_loop captured after the input
+            recorder.end_step()
+        game.start_game()
+    elapsed = time.perf_counter() - start
+
+    print(f"Replayed {game.steps} steps from {len(game.paths)} episodes in {elapsed:.2f}s ({game.steps / elapsed:.1f} steps/s)")
+    print(f"Actions matching the model chosen ones: {game.model_steps - game.mismatches}/{game.model_steps}, "
+          f"{game.steps - game.model_steps} random exploration steps not compared")
+    print(f"{'stage':>12} {'recorded ms':>12} {'replay ms':>12}")
+    for stage in STAGES:
+        recorded = game.recorded_totals[stage] / max(game.recorded_steps, 1) * 1000
+        replayed = recorder.totals[stage] / max(recorder.steps, 1) * 1000
+        print(f"{stage:>12} {recorded:>12.2f} {replayed:>12.2f}")
+
+if __name__ == '__main__':
+    main()
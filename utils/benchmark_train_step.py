@@ -0,0 +1,82 @@
+import sys
+import time
+import torch
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from model import GDAI, Trainer
+
+# Settings
+BATCH_SIZES = [1, 32, 64, 128, 256]
+WARMUP_STEPS = 3
+TIMED_STEPS = 20
+LR = 0.0005
+GAMMA = 0.9
+
+class LegacyTrainer(Trainer):
+    """Previous train_step: separate forward passes and one transfer per field"""
+    def train_step(self, state, action, reward, next_state, done):
+        if not isinstance(state, torch.Tensor):
+            state = torch.stack(state, dim=0).float().to(self.device).requires_grad_(True)
+            action = torch.stack(action, dim=0).float().to(self.device)
+            reward = torch.tensor(reward, dtype=torch.float).to(self.device)
+            next_state = torch.stack(next_state, dim=0).float().to(self.device)
+            done = torch.tensor(done, dtype=torch.bool).to(self.device)
+        else:
+            state = state.unsqueeze(0).float().to(self.device).requires_grad_(True)
+            action = action.unsqueeze(0).float().to(self.device)
+            reward = torch.tensor(reward, dtype=torch.float).unsqueeze(0).to(self.device)
+            next_state = next_state.unsqueeze(0).float().to(self.device)
+            done = torch.tensor(done, dtype=torch.bool).unsqueeze(0).to(self.device)
+
+        self.model.train()
+        pred = self.model(state)
+
+        with torch.no_grad():
+            next_Q_values = self.model(next_state)
+            max_next_Q = torch.max(next_Q_values, dim=1)[0]
+            target_Q_values = reward + self.gamma * max_next_Q * (~done)
+            target_Q_values = target_Q_values.unsqueeze(1)
+
+        self.optimizer.zero_grad()
+        loss = self.criterion(pred, target_Q_values)
+        loss.backward()
+        self.optimizer.step()
+
+def make_batch(batch_size):
+    """Random transitions shaped like Player.get_state output"""
+    if batch_size == 1:
+        return torch.rand(1, 84, 84), torch.tensor([1]), 1.0, torch.rand(1, 84, 84), False
+    states = [torch.rand(1, 84, 84) for _ in range(batch_size)]
+    actions = [torch.tensor([i % 2]) for i in range(batch_size)]
+    rewards = [1.0] * batch_size
+    next_states = [torch.rand(1, 84, 84) for _ in range(batch_size)]
+    dones = [i == batch_size - 1 for i in range(batch_size)]
+    return states, actions, rewards, next_states, dones
+
+def samples_per_second(trainer_class, batch_size, **kwargs):
+    model = GDAI()
+    trainer = trainer_class(model, lr=LR, gamma=GAMMA, **kwargs)
+    model.to(trainer.device)
+    batch = make_batch(batch_size)
+
+    for _ in range(WARMUP_STEPS):
+        trainer.train_step(*batch)
+
+    start = time.perf_counter()
+    for _ in range(TIMED_STEPS):
+        trainer.train_step(*batch)
+    next(model.parameters()).sum().item() # Wait for queued device work to finish
+    elapsed = time.perf_counter() - start
+    return batch_size * TIMED_STEPS / elapsed
+
+def main():
+    print(f"{'BATCH_SIZE':>10} {'legacy/s':>12} {'packed/s':>12} {'fused/s':>12}")
+    for batch_size in BATCH_SIZES:
+        legacy = samples_per_second(LegacyTrainer, batch_size)
+        packed = samples_per_second(Trainer, batch_size, fused=False)
+        fused = samples_per_second(Trainer, batch_size, fused=True)
+        print(f"{batch_size:>10} {legacy:>12.1f} {packed:>12.1f} {fused:>12.1f}")
+
+if __name__ == "__main__":
+    main()
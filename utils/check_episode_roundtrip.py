@@ -0,0 +1,81 @@
+import sys
+import tempfile
+import numpy as np
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from recorder import EpisodeRecorder, Frame, Step, Timings, INVALID_ACTION, read_episode
+
+# Settings
+SEED = 0
+
+def synthetic_frames(rng):
+    """Scrolling frames with a failed screenshot and a window resize in the middle"""
+    level = rng.integers(0, 255, (60, 400, 4), dtype=np.uint8)
+    frames = [np.ascontiguousarray(level[:, i * 7:i * 7 + 80]) for i in range(6)]
+    frames.append(None)
+    frames += [np.ascontiguousarray(level[:, i * 7:i * 7 + 80]) for i in range(6, 9)]
+    frames += [np.ascontiguousarray(level[:50, i * 7:i * 7 + 64]) for i in range(9, 13)] # Shape change, new keyframe
+    return frames
+
+def record(path, frames, actions):
+    recorder = EpisodeRecorder(path)
+    for i, frame in enumerate(frames):
+        recorder.record_frame(frame)
+        if i % 2 == 1:
+            action = actions[(i // 2) % len(actions)]
+            recorder.record_input(action, -0.1, i == len(frames) - 1, i // 4, explored=i % 4 == 1)
+            recorder.timings['inference'] = i / 1000
+            recorder.end_step()
+    recorder.close()
+
+def check_records(records, frames, expected_actions):
+    got_frames = [record.image for record in records if isinstance(record, Frame)]
+    steps = [record for record in records if isinstance(record, Step)]
+    timings = [record for record in records if isinstance(record, Timings)]
+
+    assert len(got_frames) == len(frames), (len(got_frames), len(frames))
+    for got, expected in zip(got_frames, frames):
+        if expected is None: assert got is None
+        else: assert got.shape == expected.shape and np.array_equal(got, expected)
+
+    expected_actions = [expected_actions[k % len(expected_actions)] for k in range(len(steps))]
+    assert [step.action for step in steps] == expected_actions, [step.action for step in steps]
+    for step in steps:
+        assert step.reward == -0.1
+    assert [step.explored for step in steps] == [i % 4 == 1 for i in range(1, len(frames), 2)][:len(steps)]
+    assert len(timings) == len(steps)
+    for i, timing in zip(range(1, len(frames), 2), timings):
+        assert abs(timing.durations['inference'] - i / 1000) < 1e-6
+    return steps
+
+def main():
+    rng = np.random.default_rng(SEED)
+    frames = synthetic_frames(rng)
+    actions = [1.0, 0.0, 300.0, float('nan'), -1e12, 2**40]
+    expected_actions = [1, 0, 300, INVALID_ACTION, INVALID_ACTION + 1, 2**31 - 1]
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = Path(folder) / 'episode.gdrec'
+        record(path, frames, actions)
+        steps = check_records(list(read_episode(path)), frames, expected_actions)
+        assert len(steps) == len(frames) // 2 and steps[-1].done
+
+        # Cut off mid-payload of the last frame, everything before it still reads back
+        data = path.read_bytes()
+        path.write_bytes(data[:-200])
+        records = list(read_episode(path))
+        check_records(records, frames[:sum(isinstance(r, Frame) for r in records)], expected_actions)
+        assert sum(isinstance(r, Frame) for r in records) == len(frames) - 1
+
+        # A game without a step leaves no file
+        empty = Path(folder) / 'empty.gdrec'
+        recorder = EpisodeRecorder(empty)
+        recorder.record_frame(frames[0])
+        recorder.close()
+        assert not empty.exists()
+
+    print("Episode files round trip exactly")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+import sys
+import random
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from model import n_step_returns
+
+# Settings
+GAMMA = 0.9
+SEED = 0
+
+def reference(rewards, ends, gamma, n_steps):
+    """Plain loop version of n_step_returns"""
+    returns, last, steps = [], [], []
+    for i in range(len(rewards)):
+        total, k = 0.0, 0
+        while k < n_steps and i + k < len(rewards):
+            total += gamma ** k * rewards[i + k]
+            k += 1
+            if ends[i + k - 1]: break
+        returns.append(total)
+        last.append(i + k - 1)
+        steps.append(k)
+    return returns, last, steps
+
+def check(rewards, ends, n_steps):
+    returns, last, steps = n_step_returns(rewards, ends, GAMMA, n_steps)
+    expected_returns, expected_last, expected_steps = reference(rewards, ends, GAMMA, n_steps)
+    assert last.tolist() == expected_last, (last.tolist(), expected_last)
+    assert steps.tolist() == expected_steps, (steps.tolist(), expected_steps)
+    for got, expected in zip(returns.tolist(), expected_returns):
+        assert abs(got - expected) < 1e-5, (returns.tolist(), expected_returns)
+
+def main():
+    # Mid-window ends, an end at the first index, back to back ends and a tail without an end
+    rewards = [1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0]
+    ends = [True, False, False, True, True, False, False, False]
+    for n_steps in (1, 2, 3, 5, 10):
+        check(rewards, ends, n_steps)
+
+    check([1.0], [False], 3) # Single transition, window clamped to the buffer
+    check([-10.0], [True], 3)
+
+    rng = random.Random(SEED)
+    for _ in range(200):
+        length = rng.randint(1, 50)
+        rewards = [rng.uniform(-10, 1) for _ in range(length)]
+        ends = [rng.random() < 0.2 for _ in range(length)]
+        check(rewards, ends, rng.randint(1, 6))
+
+    print("n_step_returns matches the reference")
+
+if __name__ == '__main__':
+    main()